@@ -1,43 +1,84 @@
+import argparse
+import hashlib
+import os
+import re
 import requests
-import copy
+import string
 import sys
-from datetime import datetime
-
-# Get cde_id, version, name, data_type from command line
-if len(sys.argv) == 5:
-    cde_id = sys.argv[1]
-    cde_version = sys.argv[2]
-    cde_version_numeric = cde_version.replace("v", "")
-    enum_name = sys.argv[3]
-    data_type = sys.argv[4]
-else:
-    print("Usage: get_cde_permissible_value.py 14808227 v1 LibrarySourceMaterial sample")
-    exit()
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# orjson decodes large caDSR responses noticeably faster but is optional.
+try:
+  from orjson import loads as json_loads
+except ImportError:
+  from json import loads as json_loads
 
 # CaDSR Variables
-cde_deeplink= f"https://cadsr.cancer.gov/onedata/dmdirect/NIH/NCI/CO/CDEDD?filter=CDEDD.ITEM_ID={cde_id}%20and%20ver_nr={cde_version_numeric}"
-url = "https://cadsrapi.cancer.gov/rad/NCIAPI/1.0/api/DataElement/" + cde_id
+cde_deeplink_template = "https://cadsr.cancer.gov/onedata/dmdirect/NIH/NCI/CO/CDEDD?filter=CDEDD.ITEM_ID={cde_id}%20and%20ver_nr={cde_version_numeric}"
+url_template = "https://cadsrapi.cancer.gov/rad/NCIAPI/1.0/api/DataElement/{cde_id}"
+
+# Where caDSR responses are cached between runs.
+default_cache_dir = ".cache"
+
+# The generated files depend on this script as well as on the caDSR response,
+# so its source is part of the key that decides whether a file is up to date.
+generator_source = Path(__file__).read_bytes()
+
+# Number of caDSR requests in flight at once when generating several CDEs.
+max_workers = 8
+
+# (connect, read) timeout in seconds for each caDSR request, so a stalled
+# connection cannot hold up a worker indefinitely.
+request_timeout = (3.05, 30)
+
+# HTTP session shared by every caDSR request so connections are kept alive.
+# Connection failures and gateway errors are retried with backoff.
+session = requests.Session()
+session.mount("https://", HTTPAdapter(
+  pool_connections=4,
+  pool_maxsize=16,
+  max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504]),
+))
+
+# Enum variant names cannot contain -_ or start with a digit.
+num2words = {'1':'One','2':'Two','3':'Three','4':'Four','5':'Five','6':'Six','7':'Seven','8':'Eight','9':'Nine','0':'Zero'}
+dash_underscore_to_space = str.maketrans("-_", "  ")
+
+# Matches the start of each word in a PascalCase enum name except the first.
+word_boundary_re = re.compile(r"(?<!^)(?=[A-Z])")
+
+# caDSR reports `dateModified` as `YYYY-MM-DD`. Matches the newline-terminated
+# dates of a whole CDE so they are all checked in one call.
+dates_modified_re = re.compile(r"(?:\d{4}-\d{2}-\d{2}\n)*")
 
 # Templates
+#
+# Placeholders are named `str.format_map` fields, so every literal Rust brace
+# in the templates below is doubled (`{{` / `}}`).
 enum_value_template = """
-    /// `CCDI_TEMPLATE_REPLACE_1`
+    /// `{value}`
     ///
-    /// * **VM Long Name**: CCDI_TEMPLATE_REPLACE_2
-    /// * **VM Public ID**: CCDI_TEMPLATE_REPLACE_3
-    /// * **Concept Code**: CCDI_TEMPLATE_REPLACE_4
-    /// * **Begin Date**:   CCDI_TEMPLATE_REPLACE_5
+    /// * **VM Long Name**: {vm_long_name}
+    /// * **VM Public ID**: {vm_public_id}
+    /// * **Concept Code**: {concept_code}
+    /// * **Begin Date**:   {begin_date}
     ///
-    /// CCDI_TEMPLATE_REPLACE_6
-    #[serde(rename = "CCDI_TEMPLATE_REPLACE_1")]
-    CCDI_TEMPLATE_REPLACE_7,
+    /// {definition}
+    #[serde(rename = "{value}")]
+    {ident},
 
 """
 
 enum_display_value_template = """
-            CCDI_TEMPLATE_REPLACE_3::CCDI_TEMPLATE_REPLACE_2 => write!(f, "CCDI_TEMPLATE_REPLACE_1"),"""
+            {enum_name}::{ident} => write!(f, "{value}"),"""
 
 enum_distrubution_value_template = """
-            CCDI_TEMPLATE_REPLACE_1 => CCDI_TEMPLATE_REPLACE_2::CCDI_TEMPLATE_REPLACE_3,"""
+            {arm} => {enum_name}::{ident},"""
 
 enum_template = """
 use introspect::Introspect;
@@ -49,168 +90,323 @@ use utoipa::ToSchema;
 
 use crate::CDE;
 
-/// **`caDSR CDE CCDI_TEMPLATE_REPLACE_1 CCDI_TEMPLATE_REPLACE_2`**
+/// **`caDSR CDE {public_id} {short_version}`**
 ///
-/// This metadata element is defined by the caDSR as "CCDI_TEMPLATE_REPLACE_3".
+/// This metadata element is defined by the caDSR as "{definition}".
 ///
 /// Link:
-/// <CCDI_TEMPLATE_REPLACE_4>
+/// <{deeplink}>
 #[derive(Clone, Debug, Deserialize, Eq, PartialEq, Serialize, ToSchema, Introspect)]
-#[schema(as = cde::CCDI_TEMPLATE_REPLACE_5::CCDI_TEMPLATE_REPLACE_6::CCDI_TEMPLATE_REPLACE_7)]
-pub enum CCDI_TEMPLATE_REPLACE_7 {
-CCDI_TEMPLATE_REPLACE_8
-}
-
-impl CDE for CCDI_TEMPLATE_REPLACE_7 {}
-
-impl std::fmt::Display for CCDI_TEMPLATE_REPLACE_7 {
-    fn fmt(&self, f: &mut std::fmt::Formatter<'_>) -> std::fmt::Result {
-        match self {
-            CCDI_TEMPLATE_REPLACE_9
-        }
-    }
-}
-
-impl Distribution<CCDI_TEMPLATE_REPLACE_7> for Standard {
-    fn sample<R: rand::Rng + ?Sized>(&self, rng: &mut R) -> CCDI_TEMPLATE_REPLACE_7 {
-        match rng.gen_range(0..=CCDI_TEMPLATE_REPLACE_01) {
-            CCDI_TEMPLATE_REPLACE_02
-        }
-    }
-}
+#[schema(as = cde::{cde_version}::{data_type}::{enum_name})]
+pub enum {enum_name} {{
+{values_block}
+}}
+
+impl CDE for {enum_name} {{}}
+
+impl std::fmt::Display for {enum_name} {{
+    fn fmt(&self, f: &mut std::fmt::Formatter<'_>) -> std::fmt::Result {{
+        match self {{
+            {display_block}
+        }}
+    }}
+}}
+
+impl Distribution<{enum_name}> for Standard {{
+    fn sample<R: rand::Rng + ?Sized>(&self, rng: &mut R) -> {enum_name} {{
+        match rng.gen_range(0..={last_arm_idx}) {{
+            {distribution_block}
+        }}
+    }}
+}}
 """
 
 
 test_convert_to_string_template = """
-        assert_eq!(CCDI_TEMPLATE_REPLACE_1::CCDI_TEMPLATE_REPLACE_2.to_string(), "CCDI_TEMPLATE_REPLACE_3");"""
+        assert_eq!({enum_name}::{ident}.to_string(), "{value}");"""
 
 test_convert_to_json_template = """
         assert_eq!(
-            serde_json::to_string(&CCDI_TEMPLATE_REPLACE_1::CCDI_TEMPLATE_REPLACE_2).unwrap(),
-            "\\\"CCDI_TEMPLATE_REPLACE_3\\\""
+            serde_json::to_string(&{enum_name}::{ident}).unwrap(),
+            "\\\"{value}\\\""
         );"""
 
 test_template = """
 #[cfg(test)]
-mod tests {
+mod tests {{
     use super::*;
 
     #[test]
-    fn it_converts_to_string_correctly() {
-        CCDI_TEMPLATE_REPLACE_1
-    }
+    fn it_converts_to_string_correctly() {{
+        {tests_string_block}
+    }}
 
     #[test]
-    fn it_serializes_to_json_correctly() {
-        CCDI_TEMPLATE_REPLACE_2
-    }
-}
+    fn it_serializes_to_json_correctly() {{
+        {tests_json_block}
+    }}
+}}
 """
 
+# The whole generated file, filled in with a single `format_map` pass.
+ccdi_cde_file_template = enum_template + test_template
+
+
+def check_template(template):
+  """Raises `ValueError` if `template` has a literal Rust brace that was not
+  doubled, so a broken template fails on startup instead of after fetching."""
+  # `parse` itself raises on a lone `{` or `}`; an undoubled `{}` parses as an
+  # empty (positional) field, which `format_map` would only reject later.
+  for _, field, _, _ in string.Formatter().parse(template):
+    if field is not None and (field == "" or field.isdigit()):
+      raise ValueError(f"template has an unescaped `{{{field}}}`; double literal braces")
+
+
+for template in [enum_value_template, enum_display_value_template, enum_distrubution_value_template, test_convert_to_string_template, test_convert_to_json_template, ccdi_cde_file_template]:
+  check_template(template)
+
+
+def write_atomic(path, content):
+  """Writes `content` to `path` through a temporary file in the same
+  directory, so an interrupted run never leaves a partial file behind."""
+  path.parent.mkdir(parents=True, exist_ok=True)
+  f = tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name + ".", suffix=".tmp", delete=False)
+  try:
+    with f:
+      f.write(content)
+    os.replace(f.name, path)
+  except BaseException:
+    os.unlink(f.name)
+    raise
+
+
+def fetch_data_element(cde_id, cde_version, cache_dir=default_cache_dir, refresh=False):
+  """Retrieves the raw JSON data element for `cde_id` from caDSR.
+
+  Responses are cached on disk keyed by CDE id and version. A cached response
+  is reused as-is unless `refresh` is set, in which case caDSR is asked again,
+  sending the cached `ETag` so an unchanged element comes back as a 304.
+  """
+  cde_version_numeric = cde_version.replace("v", "")
+  cache_path = Path(cache_dir) / f"cadsr_{cde_id}_v{cde_version_numeric}.json"
+  etag_path = cache_path.with_suffix(".etag")
+
+  if cache_path.exists() and not refresh:
+    return cache_path.read_bytes()
+
+  headers = {
+    'accept': 'application/json',
+  }
+  if cache_path.exists() and etag_path.exists():
+    headers['if-none-match'] = etag_path.read_text()
+
+  response = session.get(url_template.format(cde_id=cde_id), headers=headers, timeout=request_timeout)
+  # print(response.text)
+  if response.status_code == 304:
+    return cache_path.read_bytes()
+  response.raise_for_status()
+
+  # Drop the old ETag before replacing the body and only write the new one
+  # after, so an ETag is never paired with a body it does not describe.
+  if etag_path.exists():
+    etag_path.unlink()
+  write_atomic(cache_path, response.content)
+  if "ETag" in response.headers:
+    write_atomic(etag_path, response.headers["ETag"].encode())
+  return response.content
+
+
+def render_permissible_value(permissible_value, index, last_index, enum_name, emit_tests=True):
+  """Renders the enum variant, `Display` arm, `Distribution` arm, and (if
+  `emit_tests` is set) both tests for one permissible value."""
+  # print(permissible_value)
+  value = permissible_value["value"]
+  value_meaning = permissible_value["ValueMeaning"]
+  concepts = value_meaning["Concepts"]
 
+  # Reformat `YYYY-MM-DD` (checked in `build_ccdi_cde_file`) as `MM/DD/YYYY`.
+  date_modified = value_meaning["dateModified"]
+  begin_date = f"{date_modified[5:7]}/{date_modified[8:10]}/{date_modified[0:4]}"
 
-# Retrieve the data from CaDSR
-payload = {}
-headers = {
-  'accept': 'application/json',
-}
-response = requests.request("GET", url, headers=headers, data=payload)
-# print(response.text)
-response = response.json()
-# print(response["DataElement"]["ValueDomain"]["PermissibleValues"])
-permissible_values = response["DataElement"]["ValueDomain"]["PermissibleValues"]
-
-values = []
-display_values = []
-distribution_values = []
-
-tests_string = []
-tests_json = []
-
-index = 0
-for permissible_value in permissible_values:
-  # print(permissible_value)
-  value = copy.deepcopy(enum_value_template)
-  value = value.replace("CCDI_TEMPLATE_REPLACE_1", permissible_value["value"])
-  value = value.replace("CCDI_TEMPLATE_REPLACE_2", permissible_value["ValueMeaning"]["longName"])
-  value = value.replace("CCDI_TEMPLATE_REPLACE_3",permissible_value["ValueMeaning"]["publicId"])
-  # Include conceptCode if present; some permissible values do not have any associated Concepts.
-  if len(permissible_value["ValueMeaning"]["Concepts"]):
-    value = value.replace("CCDI_TEMPLATE_REPLACE_4", permissible_value["ValueMeaning"]["Concepts"][0]["conceptCode"])
-  else:
-    value = value.replace("CCDI_TEMPLATE_REPLACE_4","")
-  formatted_date = datetime.strptime(permissible_value["ValueMeaning"]["dateModified"], '%Y-%m-%d').strftime('%m/%d/%Y')
-  value = value.replace("CCDI_TEMPLATE_REPLACE_5", formatted_date)
-  value = value.replace("CCDI_TEMPLATE_REPLACE_6", permissible_value["ValueMeaning"]["definition"])
   # Format the name.
   # Cannot contain -_ or start with a digit
-  name = permissible_value["value"]
-  for i in ["-", "_"]: name = name.replace(i," ")
+  name = value.translate(dash_underscore_to_space)
   if name[0].isdigit():
-    num2words = {'1':'One','2':'Two','3':'Three','4':'Four','5':'Five','6':'Six','7':'Seven','8':'Eight','9':'Nine','0':'Zero'}
     name = num2words[name[0]] + name[1:]
-  formatted_name = ''.join(word.capitalize() for word in name.split())
-  value = value.replace("CCDI_TEMPLATE_REPLACE_7", formatted_name)
-  values.append(value)
-
-
-  display_value = copy.deepcopy(enum_display_value_template)
-  display_value = display_value.replace("CCDI_TEMPLATE_REPLACE_1", permissible_value["value"])
-  display_value = display_value.replace("CCDI_TEMPLATE_REPLACE_2", formatted_name)
-  display_value = display_value.replace("CCDI_TEMPLATE_REPLACE_3", enum_name)
-  display_values.append(display_value)
-
-  distribution_value = copy.deepcopy(enum_distrubution_value_template)
-  distribution_value = distribution_value.replace("CCDI_TEMPLATE_REPLACE_1", str(index) if index < len(permissible_values) - 1 else "_")
-  distribution_value = distribution_value.replace("CCDI_TEMPLATE_REPLACE_2", enum_name)
-  distribution_value = distribution_value.replace("CCDI_TEMPLATE_REPLACE_3", formatted_name)
-  distribution_values.append(distribution_value)
-
-
-  test_string = copy.deepcopy(test_convert_to_string_template)
-  test_string = test_string.replace("CCDI_TEMPLATE_REPLACE_1", enum_name)
-  test_string = test_string.replace("CCDI_TEMPLATE_REPLACE_2", formatted_name)
-  test_string = test_string.replace("CCDI_TEMPLATE_REPLACE_3", permissible_value["value"])
-  tests_string.append(test_string)
-
-
-  test_json = copy.deepcopy(test_convert_to_json_template)
-  test_json = test_json.replace("CCDI_TEMPLATE_REPLACE_1", enum_name)
-  test_json = test_json.replace("CCDI_TEMPLATE_REPLACE_2", formatted_name)
-  test_json = test_json.replace("CCDI_TEMPLATE_REPLACE_3", permissible_value["value"])
-  tests_json.append(test_json)
-
-  index = index + 1
-
-combined_values = ''.join(values)
-combined_display_values = ''.join(display_values)
-combined_distribution_values = ''.join(distribution_values)
-# print(combined_distribution_values)
-
-combined_test_json = ''.join(tests_json)
-combined_test_string = ''.join(tests_string)
-
-cde_enum = copy.deepcopy(enum_template)
-cde_enum = cde_enum.replace("CCDI_TEMPLATE_REPLACE_1", response["DataElement"]["publicId"])
-cde_enum = cde_enum.replace("CCDI_TEMPLATE_REPLACE_2", response["DataElement"]["version"] + ".00")
-cde_enum = cde_enum.replace("CCDI_TEMPLATE_REPLACE_3", response["DataElement"]["definition"])
-cde_enum = cde_enum.replace("CCDI_TEMPLATE_REPLACE_4", cde_deeplink)
-cde_enum = cde_enum.replace("CCDI_TEMPLATE_REPLACE_5", cde_version)
-cde_enum = cde_enum.replace("CCDI_TEMPLATE_REPLACE_6", data_type)
-cde_enum = cde_enum.replace("CCDI_TEMPLATE_REPLACE_7", enum_name)
-cde_enum = cde_enum.replace("CCDI_TEMPLATE_REPLACE_8", combined_values)
-cde_enum = cde_enum.replace("CCDI_TEMPLATE_REPLACE_9", combined_display_values)
-cde_enum = cde_enum.replace("CCDI_TEMPLATE_REPLACE_01", str(len(permissible_values) - 1))
-cde_enum = cde_enum.replace("CCDI_TEMPLATE_REPLACE_02", combined_distribution_values)
-
-
-
-test_str = copy.deepcopy(test_template)
-test_str = test_str.replace("CCDI_TEMPLATE_REPLACE_1", combined_test_string)
-test_str = test_str.replace("CCDI_TEMPLATE_REPLACE_2", combined_test_json)
-
-
-ccdi_cde_file = cde_enum + test_str
-# print(cde_enum)
-print(ccdi_cde_file)
-
+  formatted_name = ''.join(map(str.capitalize, name.split()))
+
+  fields = {
+    "value": value,
+    "vm_long_name": value_meaning["longName"],
+    "vm_public_id": value_meaning["publicId"],
+    # Include conceptCode if present; some permissible values do not have any associated Concepts.
+    "concept_code": concepts[0]["conceptCode"] if concepts else "",
+    "begin_date": begin_date,
+    "definition": value_meaning["definition"],
+    "ident": formatted_name,
+    "enum_name": enum_name,
+    "arm": str(index) if index < last_index else "_",
+  }
+
+  rendered = (
+    enum_value_template.format_map(fields),
+    enum_display_value_template.format_map(fields),
+    enum_distrubution_value_template.format_map(fields),
+  )
+  if not emit_tests:
+    return rendered
+  return rendered + (
+    test_convert_to_string_template.format_map(fields),
+    test_convert_to_json_template.format_map(fields),
+  )
+
+
+def build_ccdi_cde_file(response, cde_id, enum_name, cde_version, data_type, emit_tests=True):
+  """Renders the Rust source for a CDE from its caDSR data element, with a
+  `tests` module unless `emit_tests` is unset."""
+  cde_version_numeric = cde_version.replace("v", "")
+  cde_deeplink = cde_deeplink_template.format(cde_id=cde_id, cde_version_numeric=cde_version_numeric)
+
+  # print(response["DataElement"]["ValueDomain"]["PermissibleValues"])
+  permissible_values = response["DataElement"]["ValueDomain"]["PermissibleValues"]
+  last_index = len(permissible_values) - 1
+
+  # Validate every `dateModified` once per CDE rather than once per value;
+  # skipped entirely under `python -O`.
+  assert dates_modified_re.fullmatch("".join(pv["ValueMeaning"]["dateModified"] + "\n" for pv in permissible_values)), \
+    f"CDE {cde_id} has a dateModified that is not YYYY-MM-DD"
+
+  rendered = [
+    render_permissible_value(permissible_value, index, last_index, enum_name, emit_tests)
+    for index, permissible_value in enumerate(permissible_values)
+  ]
+
+  fields = {
+    "public_id": response["DataElement"]["publicId"],
+    "short_version": response["DataElement"]["version"] + ".00",
+    "definition": response["DataElement"]["definition"],
+    "deeplink": cde_deeplink,
+    "cde_version": cde_version,
+    "data_type": data_type,
+    "enum_name": enum_name,
+    "values_block": ''.join(r[0] for r in rendered),
+    "display_block": ''.join(r[1] for r in rendered),
+    "last_arm_idx": str(last_index),
+    "distribution_block": ''.join(r[2] for r in rendered),
+  }
+  if not emit_tests:
+    return enum_template.format_map(fields)
+
+  fields["tests_string_block"] = ''.join(r[3] for r in rendered)
+  fields["tests_json_block"] = ''.join(r[4] for r in rendered)
+  return ccdi_cde_file_template.format_map(fields)
+
+
+def render_key(response_content, cde, emit_tests):
+  """Returns a digest of everything a generated CDE file is rendered from."""
+  digest = hashlib.sha1(generator_source)
+  digest.update(response_content)
+  digest.update(repr((cde, emit_tests)).encode())
+  return digest.hexdigest()
+
+
+def output_path(output_dir, cde_version, enum_name, data_type):
+  """Returns where the Rust source for a CDE is written, e.g.
+  `v1/sample/library_source_material.rs`, matching its `cde::v1::sample` schema path."""
+  file_name = word_boundary_re.sub("_", enum_name).lower() + ".rs"
+  return Path(output_dir) / cde_version / data_type / file_name
+
+
+def generate(cde, cache_dir=default_cache_dir, refresh=False, emit_tests=True, output_dir=None, force=False):
+  """Fetches and renders a single `(cde_id, cde_version, enum_name, data_type)` CDE.
+
+  Without `output_dir`, the rendered source is returned. Otherwise it is
+  written to its output path, which is returned, unless that file exists and
+  was last rendered there from the same inputs; then `None` is returned.
+
+  Only the inputs are compared, not the file's contents, so a generated file
+  can be formatted with `rustfmt` (or otherwise edited) and committed without
+  being overwritten on the next run. The flip side is that changes to the file
+  itself, e.g. from a rebase, are not detected; pass `force` to re-render.
+  """
+  cde_id, cde_version, enum_name, data_type = cde
+  response_content = fetch_data_element(cde_id, cde_version, cache_dir, refresh)
+
+  if output_dir is None:
+    return build_ccdi_cde_file(json_loads(response_content), cde_id, enum_name, cde_version, data_type, emit_tests)
+
+  out_file = output_path(output_dir, cde_version, enum_name, data_type)
+  # One stamp per resolved output file, holding the key it was rendered with.
+  stamp_name = hashlib.sha1(str(out_file.resolve()).encode()).hexdigest() + ".stamp"
+  stamp_path = Path(cache_dir) / "stamps" / stamp_name
+  key = render_key(response_content, cde, emit_tests)
+  if not force and out_file.exists() and stamp_path.exists() and stamp_path.read_text() == key:
+    return None
+
+  ccdi_cde_file = build_ccdi_cde_file(json_loads(response_content), cde_id, enum_name, cde_version, data_type, emit_tests)
+  out_file.parent.mkdir(parents=True, exist_ok=True)
+  with out_file.open("w") as f:
+    print(ccdi_cde_file, file=f)
+  stamp_path.parent.mkdir(parents=True, exist_ok=True)
+  stamp_path.write_text(key)
+  return out_file
+
+
+def main():
+  # Get cde_id, version, name, data_type from command line
+  parser = argparse.ArgumentParser(
+    usage="get_cde_permissible_value.py [-o OUTPUT_DIR] [--refresh] [--force] [--no-tests] 14808227 v1 LibrarySourceMaterial sample [...]",
+  )
+  parser.add_argument("cdes", nargs="+", metavar="CDE_ID VERSION ENUM_NAME DATA_TYPE",
+    help="one or more CDEs to generate, each given as four values")
+  parser.add_argument("-o", "--output-dir",
+    help="write each CDE to OUTPUT_DIR/VERSION/DATA_TYPE/<enum_name>.rs instead of stdout, "
+    "skipping files already rendered there from the same inputs (the files "
+    "themselves are not compared, so they can be run through rustfmt)")
+  parser.add_argument("--force", action="store_true",
+    help="re-render every file in OUTPUT_DIR even if its inputs are unchanged")
+  parser.add_argument("--cache-dir", default=default_cache_dir,
+    help=f"directory where caDSR responses are cached (default: {default_cache_dir})")
+  parser.add_argument("--refresh", action="store_true",
+    help="revalidate cached caDSR responses instead of reusing them")
+  parser.add_argument("--no-tests", dest="emit_tests", action="store_false",
+    help="omit the generated `tests` module")
+  args = parser.parse_args()
+
+  if len(args.cdes) % 4:
+    parser.error("each CDE needs a cde_id, version, name, and data_type")
+  cdes = [tuple(args.cdes[i:i + 4]) for i in range(0, len(args.cdes), 4)]
+  if len(cdes) > 1 and not args.output_dir:
+    parser.error("--output-dir is required when generating more than one CDE")
+  if args.output_dir:
+    out_files = {}
+    for cde_id, cde_version, enum_name, data_type in cdes:
+      out_file = output_path(args.output_dir, cde_version, enum_name, data_type)
+      if out_file in out_files:
+        parser.error(f"CDEs {out_files[out_file]} and {cde_id} would both be written to {out_file}")
+      out_files[out_file] = cde_id
+
+  # Retrieve the data from CaDSR
+  worker = partial(generate,
+    cache_dir=args.cache_dir,
+    refresh=args.refresh,
+    emit_tests=args.emit_tests,
+    output_dir=args.output_dir,
+    force=args.force,
+  )
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    results = list(executor.map(worker, cdes))
+
+  if not args.output_dir:
+    print(results[0])
+    return
+
+  for (cde_id, cde_version, enum_name, data_type), out_file in zip(cdes, results):
+    if out_file is None:
+      print(f"Unchanged {output_path(args.output_dir, cde_version, enum_name, data_type)}", file=sys.stderr)
+    else:
+      print(f"Wrote {out_file}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+  main()